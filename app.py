@@ -1,74 +1,297 @@
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 import requests
+from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
+from requests.packages.urllib3.util.retry import Retry
 import numpy as np
-from scipy.spatial.distance import cosine
-from sentence_transformers import SentenceTransformer
+import orjson
 import json
+import functools
+import heapq
 import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, NamedTuple, Tuple, Union
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+
+def keyword_pattern(keywords: List[str]) -> re.Pattern:
+    """Compile keywords into one pattern matching any of them as a substring"""
+    return re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+
+# Query routing keywords, matched against the lowercased query
+REORDER_RE = keyword_pattern(['reorder', 'stock', 'inventory', 'level', 'minimum', 'refill', 'replenish'])
+INVESTMENT_RE = keyword_pattern(['invest', 'buy', 'purchase', 'recommend', 'best product'])
+STOCK_RE = keyword_pattern(['stock', 'inventory', 'reorder'])
+PROMOTION_RE = keyword_pattern(['suggest', 'recommend'])
+
+class QueryIntent(NamedTuple):
+    """Keyword matches that fully determine how a query is answered"""
+    reorder: bool
+    purchase: bool
+    investment: bool
+    stock: bool
+    coupon: bool
+    expired: bool
+    active: bool
+    promotion: bool
+    sales: bool
+
+@functools.lru_cache(maxsize=4096)
+def parse_intent(query_lower: str) -> QueryIntent:
+    """Match a lowercased query against every keyword group used for routing
+
+    Memoized so exact repeats of recent queries skip the keyword scans.
+    """
+    return QueryIntent(
+        reorder=bool(REORDER_RE.search(query_lower)),
+        purchase=bool(INVESTMENT_RE.search(query_lower)),
+        investment='investment' in query_lower,
+        stock=bool(STOCK_RE.search(query_lower)),
+        coupon='coupon' in query_lower,
+        expired='expired' in query_lower,
+        active='active' in query_lower,
+        promotion=bool(PROMOTION_RE.search(query_lower)),
+        sales='sales' in query_lower
+    )
+
+class DataSnapshot(NamedTuple):
+    """Record lists from one fetch, with the analyses and responses built from them"""
+    products: List[Dict]
+    orders: List[Dict]
+    coupons: List[Dict]
+    analyses: Dict[Tuple, Future]
+    responses: Dict[QueryIntent, str]
+
+def cached_analysis(method):
+    """Cache an analysis result on the data snapshot it was computed from
+
+    Called without a snapshot, the analysis runs on the current one. Extra
+    arguments are part of the cache key. Concurrent requests that miss the
+    cache wait for one shared computation instead of each running the
+    analysis themselves.
+    """
+    @functools.wraps(method)
+    def wrapper(self, data: DataSnapshot = None, *args):
+        if data is None:
+            data = self._data
+        cache = data.analyses
+        key = (method.__name__,) + args
+        with self._analysis_lock:
+            future = cache.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = cache[key] = Future()
+
+        if is_owner:
+            try:
+                future.set_result(method(self, data, *args))
+            except Exception as e:
+                # Let the next call retry instead of caching the failure
+                with self._analysis_lock:
+                    cache.pop(key, None)
+                future.set_exception(e)
+        return future.result()
+    return wrapper
+
+@functools.lru_cache(maxsize=4096)
+def parse_date(value: str) -> np.datetime64:
+    """Parse a '%Y-%m-%d' API date with strptime, memoized per distinct string"""
+    return np.datetime64(datetime.strptime(value, '%Y-%m-%d').date(), 'D')
+
+def narrow_int_array(values: List[int]) -> np.ndarray:
+    """Build an integer array with the smallest dtype that holds every value"""
+    array = np.asarray(values, dtype=np.int64)
+    if not array.size:
+        return array.astype(np.int32)
+    dtype = np.promote_types(np.min_scalar_type(array.min()), np.min_scalar_type(array.max()))
+    return array.astype(dtype)
+
 class AIAssistant:
-    def __init__(self, model):
-        self.model = model
+    def __init__(self, model_name: str, backend: str = 'torch', model_file: str = None, dtype: str = None,
+                 compile_model: bool = False):
+        self.model_name = model_name
+        self.backend = backend
+        self.model_file = model_file
+        self.dtype = dtype
+        self.compile_model = compile_model
         self.inventory_data = None
         self.orders_data = None
         self.coupons_data = None
-        self.product_embeddings = None
         self.REORDER_THRESHOLD = 20
         self.last_context = None
 
+        # Fetched data is reused for `_cache_ttl` seconds. Each fetch replaces
+        # the whole snapshot, so a query keeps reading the data it started on.
+        # Stale data is served while refreshing, but never past `_max_staleness`
+        # seconds, and a failed fetch is not retried for `_retry_interval` seconds.
+        self._cache_ttl = 60
+        self._max_staleness = 5 * self._cache_ttl
+        self._retry_interval = 10
+        self._cache_ts = 0.0
+        self._last_attempt_ts = 0.0
+        self._last_error = None
+        self._data = DataSnapshot([], [], [], {}, {})
+        self._analysis_lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+
+        # One keep-alive session shared by all API calls. The POSTs are
+        # read-only lookups, so they are safe to retry.
+        self._session = requests.Session()
+        retries = Retry(total=2, backoff_factor=0.1, status_forcelist=[502, 503, 504],
+                        allowed_methods=['POST'])
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retries)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        # (connect, read) seconds; a hung API must not hold `_fetch_lock` forever
+        self._request_timeout = (5, 30)
+
+    @functools.cached_property
+    def model(self):
+        """Sentence embedding model, loaded on first use"""
+        import torch
+        from sentence_transformers import SentenceTransformer
+        model_kwargs = {'file_name': self.model_file} if self.model_file else None
+        model = SentenceTransformer(self.model_name, backend=self.backend, model_kwargs=model_kwargs)
+        if self.backend == 'torch':
+            if self.dtype:
+                model.to(getattr(torch, self.dtype))
+            elif torch.cuda.is_available():
+                model.half()  # fp16 weights on GPU
+            if self.compile_model:
+                model[0].auto_model = torch.compile(model[0].auto_model, mode='reduce-overhead', dynamic=True)
+        return model
+
     # [Previous AIAssistant class methods remain exactly the same]
     # Copy all methods from the original AIAssistant class here
 
-    def fetch_data(self):
+    def fetch_data(self, force: bool = False):
+        """Make sure API data is loaded, refreshing it once it is stale
+
+        The first load, a forced one and a reload of data older than
+        `_max_staleness` block, so fetch errors reach the caller. Otherwise
+        stale data keeps being served while a background thread refreshes it,
+        so queries do not wait on the upstream APIs.
+        """
+        if force or self.inventory_data is None:
+            self._load_data(force)
+        elif time.monotonic() - self._cache_ts > self._max_staleness:
+            self._load_data()
+        elif not self._is_fresh() and self._retry_due() and not self._fetch_lock.locked():
+            self._last_attempt_ts = time.monotonic()
+            threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+    def _is_fresh(self) -> bool:
+        """Check whether the loaded data is younger than `_cache_ttl` seconds"""
+        return self.inventory_data is not None and time.monotonic() - self._cache_ts < self._cache_ttl
+
+    def _retry_due(self) -> bool:
+        """Check whether the last fetch succeeded or failed over `_retry_interval` seconds ago"""
+        return self._last_error is None or time.monotonic() - self._last_attempt_ts >= self._retry_interval
+
+    def _refresh_in_background(self):
+        """Reload stale data, keeping the current data if the APIs fail"""
+        try:
+            self._load_data()
+        except Exception:
+            pass  # Already logged; a stale query retries after `_retry_interval`
+
+    def _load_data(self, force: bool = False):
         """Fetch and store all data from APIs"""
+        with self._fetch_lock:
+            if not force and self._is_fresh():
+                return
+            if not force and not self._retry_due():
+                raise RuntimeError("Data APIs are unavailable") from self._last_error
+
+            self._last_attempt_ts = time.monotonic()
+            try:
+                # Fetch inventory, orders and coupons data concurrently
+                with ThreadPoolExecutor(max_workers=3) as executor:
+                    inventory_url = "http://10.123.79.112:1026/u/home/json/pmai006"
+                    inventory_payload = {"PMAI006Operation": {}}
+                    inventory_future = executor.submit(self._post, inventory_url, inventory_payload)
+
+                    orders_url = "http://10.123.79.112:1026/u/home/json/pmai009"
+                    orders_payload = {"PMAI009Operation": {}}
+                    orders_future = executor.submit(self._post, orders_url, orders_payload)
+
+                    coupons_url = "http://10.123.79.112:1026/u/home/json/pmai016"
+                    coupons_payload = {"PMAI016Operation": {}}
+                    coupons_future = executor.submit(self._post, coupons_url, coupons_payload)
+
+                inventory_data = orjson.loads(inventory_future.result().content)
+                orders_data = orjson.loads(orders_future.result().content)
+                coupons_data = orjson.loads(coupons_future.result().content)
+
+                # Unwrap the record lists once for every analysis to share
+                products = (inventory_data.get('PMAI006OperationResponse', {})
+                            .get('ws_invent_recout', {})
+                            .get('ws_invent_res', []))
+                orders = (orders_data.get('PMAI009OperationResponse', {})
+                          .get('ws_order_recout', {})
+                          .get('ws_order_res', []))
+                coupons = (coupons_data.get('PMAI016OperationResponse', {})
+                           .get('ws_coupon_recout', {})
+                           .get('ws_coupon_res', []))
+
+                # One assignment publishes the new records together with empty
+                # caches; queries already running keep their old snapshot
+                self._data = DataSnapshot(products, orders, coupons, {}, {})
+                self.inventory_data = inventory_data
+                self.orders_data = orders_data
+                self.coupons_data = coupons_data
+                self._cache_ts = time.monotonic()
+                self._last_error = None
+
+            except Exception as e:
+                self._last_error = e
+                logger.error("Error fetching data: %s", e)
+                raise
+
+    def _post(self, url: str, payload: Dict) -> requests.Response:
+        """POST a JSON payload to an API endpoint over the shared session"""
+        return self._session.post(url, json=payload, verify=False, timeout=self._request_timeout)
+
+    def warm_up(self):
+        """Load the data and run every analysis once so the first query starts warm"""
+        start = time.perf_counter()
         try:
-            requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-            
-            # Fetch inventory data
-            inventory_url = "http://10.123.79.112:1026/u/home/json/pmai006"
-            inventory_payload = {"PMAI006Operation": {}}
-            self.inventory_data = requests.post(inventory_url, json=inventory_payload, verify=False).json()
-            
-            # Fetch orders data
-            orders_url = "http://10.123.79.112:1026/u/home/json/pmai009"
-            orders_payload = {"PMAI009Operation": {}}
-            self.orders_data = requests.post(orders_url, json=orders_payload, verify=False).json()
-            
-            # Fetch coupons data
-            coupons_url = "http://10.123.79.112:1026/u/home/json/pmai016"
-            coupons_payload = {"PMAI016Operation": {}}
-            self.coupons_data = requests.post(coupons_url, json=coupons_payload, verify=False).json()
-            
-            self._generate_product_embeddings()
-            
+            self.fetch_data(force=True)
+            self._check_reorder_levels()
+            self._analyze_product_potential()
+            self._analyze_inventory_health()
+            self._analyze_sales_trends()
+            self._analyze_coupon_effectiveness()
         except Exception as e:
-            logger.error(f"Error fetching data: {str(e)}")
-            raise
-
+            logger.error("Warm-up aborted after %.2fs: %s", time.perf_counter() - start, e)
+        else:
+            logger.info("Warm-up finished in %.2fs", time.perf_counter() - start)
+        finally:
+            # Don't hand pooled sockets to forked Gunicorn workers
+            self._session.close()
 
     def get_best_investment_recommendations(self) -> str:
         """Generate best investment recommendations based on multiple factors"""
-        products = self._get_products()
-        sales_data = self._analyze_sales_trends()
-        
-        product_scores = []
-        for product in products:
-            score = self._calculate_investment_score(product, sales_data)
-            product_scores.append((product, score))
+        data = self._data
+        products = data.products
+        sales_data = self._analyze_sales_trends(data)
         
-        # Sort by score in descending order
-        product_scores.sort(key=lambda x: x[1], reverse=True)
+        scores = self._calculate_investment_scores(data, sales_data)
+        product_scores = [(products[i], scores[i]) for i in self._top_indices(scores, 3)]
         
-        response = "🎯 Top Investment Recommendations:\n\n"
-        for i, (product, score) in enumerate(product_scores[:3], 1):
-            response += (
+        parts = ["🎯 Top Investment Recommendations:\n\n"]
+        for i, (product, score) in enumerate(product_scores, 1):
+            parts.append(
                 f"#{i} {product['ws_item_name']}\n"
                 f"📊 Investment Score: {score:.1f}/100\n"
                 f"💰 Current Price: ${float(product['ws_unit_price']):.2f}\n"
@@ -76,86 +299,86 @@ class AIAssistant:
                 f"📈 Sales Trend: {self._get_sales_trend(product['ws_item_id'], sales_data)}\n\n"
             )
         
-        return response
+        return ''.join(parts)
 
     def check_inventory_status(self) -> str:
         """Generate comprehensive inventory status report"""
         inventory = self._analyze_inventory_health()
         
-        response = "📦 Current Inventory Status:\n\n"
+        parts = ["📦 Current Inventory Status:\n\n"]
         
         # Low stock items
         if inventory['low_stock']:
-            response += "⚠️ Low Stock Items:\n"
+            parts.append("⚠️ Low Stock Items:\n")
             for item in inventory['low_stock']:
-                response += f"• {item['name']}: {item['stock']} units remaining\n"
-            response += "\n"
+                parts.append(f"• {item['name']}: {item['stock']} units remaining\n")
+            parts.append("\n")
         
         # Overstock items
         if inventory['overstock']:
-            response += "📈 Overstocked Items:\n"
+            parts.append("📈 Overstocked Items:\n")
             for item in inventory['overstock']:
-                response += f"• {item['name']}: {item['stock']} units (high inventory)\n"
-            response += "\n"
+                parts.append(f"• {item['name']}: {item['stock']} units (high inventory)\n")
+            parts.append("\n")
         
         # Healthy stock items
-        response += f"✅ {len(inventory['healthy_stock'])} items at healthy stock levels\n"
+        parts.append(f"✅ {len(inventory['healthy_stock'])} items at healthy stock levels\n")
         
-        return response
+        return ''.join(parts)
 
     def get_sales_performance(self) -> str:
         """Generate detailed sales performance analysis"""
         sales = self._analyze_sales_trends()
         
-        response = "📊 Sales Performance Analysis:\n\n"
+        parts = ["📊 Sales Performance Analysis:\n\n"]
         
         # Overall metrics
-        response += f"📈 Total Orders: {sales['total_orders']}\n\n"
+        parts.append(f"📈 Total Orders: {sales['total_orders']}\n\n")
         
         # Top selling products
-        response += "🏆 Top Selling Products:\n"
+        parts.append("🏆 Top Selling Products:\n")
         for prod_id, details in sales['popular_products']:
-            response += (
+            parts.append(
                 f"• {details['product_name']}\n"
                 f"  📦 Units Sold: {details['quantity']}\n"
                 f"  💰 Revenue: ${details['revenue']:,.2f}\n\n"
             )
         
-        return response
+        return ''.join(parts)
 
     def analyze_coupons(self, query_type: str = 'all') -> str:
         """Generate coupon analysis based on query type with improved formatting"""
         coupon_data = self._analyze_coupon_effectiveness()
         
         if query_type == 'active':
-            response = "🎟️ Active Coupons:\n\n"
+            parts = ["🎟️ Active Coupons:\n\n"]
             for coupon in coupon_data['active_coupons']:
-                response += (
+                parts.append(
                     f"🏷️ {coupon['code']}\n"
                     f"   • Discount: {coupon['discount']}% off\n"
                     f"   • Campaign: {coupon['campaign']}\n"
                     f"   • Valid until: {coupon['end_date']}\n\n"
                 )
             if not coupon_data['active_coupons']:
-                response += "No active coupons found.\n"
+                parts.append("No active coupons found.\n")
         
         elif query_type == 'expired':
-            response = "⏰ Expired Coupons:\n\n"
+            parts = ["⏰ Expired Coupons:\n\n"]
             for coupon in coupon_data['expired_coupons']:
-                response += (
+                parts.append(
                     f"🏷️ {coupon['code']}\n"
                     f"   • Was: {coupon['discount']}% off\n"
                     f"   • Campaign: {coupon['campaign']}\n"
                     f"   • Expired: {coupon['end_date']}\n\n"
                 )
             if not coupon_data['expired_coupons']:
-                response += "No expired coupons found.\n"
+                parts.append("No expired coupons found.\n")
         
         elif query_type == 'high_value':
-            response = "💎 High-Value Coupons (>20% off):\n\n"
+            parts = ["💎 High-Value Coupons (>20% off):\n\n"]
             for coupon in coupon_data['high_value_coupons']:
-                status = "Active" if coupon in coupon_data['active_coupons'] else "Expired"
-                response += (
+                status = "Active" if coupon['active'] else "Expired"
+                parts.append(
                     f"🏷️ {coupon['code']}\n"
                     f"   • Discount: {coupon['discount']}% off\n"
                     f"   • Campaign: {coupon['campaign']}\n"
@@ -163,46 +386,86 @@ class AIAssistant:
                     f"   • Valid until: {coupon['end_date']}\n\n"
                 )
             if not coupon_data['high_value_coupons']:
-                response += "No high-value coupons found.\n"
+                parts.append("No high-value coupons found.\n")
         
         else:
-            response = "🎫 Coupon Overview:\n\n"
-            response += f"✅ Active Coupons: {len(coupon_data['active_coupons'])}\n"
-            response += f"⏰ Expired Coupons: {len(coupon_data['expired_coupons'])}\n"
-            response += f"💎 High-Value Coupons: {len(coupon_data['high_value_coupons'])}\n"
+            parts = ["🎫 Coupon Overview:\n\n"]
+            parts.append(f"✅ Active Coupons: {len(coupon_data['active_coupons'])}\n")
+            parts.append(f"⏰ Expired Coupons: {len(coupon_data['expired_coupons'])}\n")
+            parts.append(f"💎 High-Value Coupons: {len(coupon_data['high_value_coupons'])}\n")
         
-        return response
+        return ''.join(parts)
 
-    def _calculate_investment_score(self, product: Dict, sales_data: Dict) -> float:
-        """Calculate investment score for a product based on multiple factors"""
-        product_id = product['ws_item_id']
-        product_sales = sales_data['product_sales'].get(product_id, {'quantity': 0, 'revenue': 0})
-        
-        # Calculate various metrics
-        stock_level = float(product['ws_stock'])
-        unit_price = float(product['ws_unit_price'])
-        cost_price = float(product.get('ws_cost_price', 0))
+    @cached_analysis
+    def _product_column(self, data: DataSnapshot, column: str) -> np.ndarray:
+        """Parse one product field into an array aligned with the snapshot's products
+
+        Each column is parsed and cached on its own, so a malformed field only
+        fails the analyses that read it.
+        """
+        products = data.products
+        if column == 'stock':
+            return narrow_int_array([int(p.get('ws_stock', 0)) for p in products])
+        if column == 'min_stock':
+            return narrow_int_array([int(p.get('ws_min_stock', self.REORDER_THRESHOLD)) for p in products])
+        if column in ('unit_price', 'cost_price'):
+            field = 'ws_' + column
+            return np.fromiter((float(p.get(field, 0)) for p in products), dtype=np.float64, count=len(products))
+        field = {'id': 'ws_item_id', 'name': 'ws_item_name', 'category': 'ws_category'}[column]
+        return np.array([p.get(field) for p in products], dtype=object)
+
+    @cached_analysis
+    def _product_sales(self, data: DataSnapshot) -> Dict[str, np.ndarray]:
+        """Quantity sold and revenue per product, aligned with the snapshot's products"""
+        product_sales = self._analyze_sales_trends(data)['product_sales']
+        no_sales = {'quantity': 0, 'revenue': 0}
+        sales = [product_sales.get(product_id, no_sales) for product_id in self._product_column(data, 'id')]
+        count = len(sales)
+        return {
+            'quantity': np.fromiter((s['quantity'] for s in sales), dtype=np.int32, count=count),
+            'revenue': np.fromiter((s['revenue'] for s in sales), dtype=np.float64, count=count)
+        }
+
+    def _calculate_investment_scores(self, data: DataSnapshot, sales_data: Dict) -> np.ndarray:
+        """Calculate investment scores for all products based on multiple factors"""
+        sales = self._product_sales(data)
+        stock_level = self._product_column(data, 'stock')
+        unit_price = self._product_column(data, 'unit_price')
+        cost_price = self._product_column(data, 'cost_price')
         
         # Sales velocity (30% weight)
-        sales_velocity = product_sales['quantity'] / 30
-        velocity_score = min(sales_velocity * 10, 30)
+        sales_velocity = sales['quantity'] / 30
+        velocity_score = np.minimum(sales_velocity * 10, 30)
         
         # Profit margin (25% weight)
-        margin = ((unit_price - cost_price) / unit_price) * 100
-        margin_score = min(margin, 25)
+        margin = np.where(unit_price > 0, (unit_price - cost_price) / np.maximum(unit_price, 1e-9) * 100, 0)
+        margin_score = np.minimum(margin, 25)
         
-        # Stock efficiency (25% weight)
+        # Stock efficiency (25% weight), none for products without sales
         ideal_stock = sales_velocity * 14  # 2 weeks of stock
-        efficiency = 25 * (1 - abs(stock_level - ideal_stock) / ideal_stock)
-        efficiency_score = max(0, efficiency)
+        efficiency = np.where(
+            ideal_stock > 0,
+            25 * (1 - np.abs(stock_level - ideal_stock) / np.maximum(ideal_stock, 1e-9)),
+            0
+        )
+        efficiency_score = np.maximum(0, efficiency)
         
         # Revenue contribution (20% weight)
-        total_revenue = sum(p['revenue'] for p in sales_data['product_sales'].values())
-        revenue_score = (product_sales['revenue'] / total_revenue * 100) if total_revenue > 0 else 0
-        revenue_score = min(revenue_score * 2, 20)
+        total_revenue = sales_data['total_revenue']
+        if total_revenue > 0:
+            revenue_score = sales['revenue'] / total_revenue * 100
+        else:
+            revenue_score = np.zeros_like(sales['revenue'])
+        revenue_score = np.minimum(revenue_score * 2, 20)
         
         return velocity_score + margin_score + efficiency_score + revenue_score
 
+    @staticmethod
+    def _top_indices(scores: np.ndarray, k: int) -> np.ndarray:
+        """Return indices of the `k` highest scores, best first"""
+        # Rank by score, then by position so ties keep their original order
+        return np.lexsort((np.arange(len(scores)), -scores))[:k]
+
     def _get_sales_trend(self, product_id: str, sales_data: Dict) -> str:
         """Calculate sales trend for a product"""
         if product_id not in sales_data['product_sales']:
@@ -220,132 +483,153 @@ class AIAssistant:
 
     def _get_products(self) -> List[Dict]:
         """Get products from inventory data"""
-        return (self.inventory_data.get('PMAI006OperationResponse', {})
-                .get('ws_invent_recout', {})
-                .get('ws_invent_res', []))
+        return self._data.products
 
-    def _generate_product_embeddings(self):
-        """Generate embeddings for product descriptions"""
-        self.products = (self.inventory_data.get('PMAI006OperationResponse', {})
-                        .get('ws_invent_recout', {})
-                        .get('ws_invent_res', []))
-        
+    @cached_analysis
+    def _product_embeddings(self, data: DataSnapshot) -> np.ndarray:
+        """Embed the snapshot's product descriptions, one unit-length row per product"""
         product_descriptions = []
-        for product in self.products:
+        for product in data.products:
             description = (f"{product.get('ws_item_name', '')} - "
                          f"{product.get('ws_description', '')} - "
                          f"Category: {product.get('ws_category', '')}")
             product_descriptions.append(description)
         
-        self.product_embeddings = self.model.encode(product_descriptions)
+        # Unit-length rows turn cosine similarity into a plain dot product
+        embeddings = self.model.encode(product_descriptions, batch_size=128, show_progress_bar=False,
+                                       convert_to_numpy=True, normalize_embeddings=True)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
 
-    def _analyze_inventory_health(self) -> Dict[str, List[Dict]]:
+    @cached_analysis
+    def _analyze_inventory_health(self, data: DataSnapshot) -> Dict[str, List[Dict]]:
         """Analyze inventory health status"""
-        inventory_health = {
-            'low_stock': [],
-            'healthy_stock': [],
-            'overstock': []
-        }
+        stock = self._product_column(data, 'stock')
+        ids = self._product_column(data, 'id').tolist()
+        names = self._product_column(data, 'name').tolist()
+        stocks = stock.tolist()
+        prices = self._product_column(data, 'unit_price').tolist()
 
-        products = (self.inventory_data.get('PMAI006OperationResponse', {})
-                   .get('ws_invent_recout', {})
-                   .get('ws_invent_res', []))
-
-        for product in products:
-            stock = int(product.get('ws_stock', 0))
-            product_info = {
-                'id': product.get('ws_item_id'),
-                'name': product.get('ws_item_name'),
-                'stock': stock,
-                'price': float(product.get('ws_unit_price', 0))
-            }
+        low_stock = stock <= self.REORDER_THRESHOLD
+        overstock = (stock > 50) & ~low_stock  # Overstock threshold
+        healthy_stock = ~(low_stock | overstock)
+
+        def product_infos(mask: np.ndarray) -> List[Dict]:
+            return [{
+                'id': ids[i],
+                'name': names[i],
+                'stock': stocks[i],
+                'price': prices[i]
+            } for i in np.flatnonzero(mask).tolist()]
 
-            if stock <= self.REORDER_THRESHOLD:
-                inventory_health['low_stock'].append(product_info)
-            elif stock > 50:  # Overstock threshold
-                inventory_health['overstock'].append(product_info)
-            else:
-                inventory_health['healthy_stock'].append(product_info)
+        inventory_health = {
+            'low_stock': product_infos(low_stock),
+            'healthy_stock': product_infos(healthy_stock),
+            'overstock': product_infos(overstock)
+        }
 
         return inventory_health
 
-    def _analyze_sales_trends(self) -> Dict[str, Any]:
+    @cached_analysis
+    def _analyze_sales_trends(self, data: DataSnapshot) -> Dict[str, Any]:
         """Analyze sales trends from orders data"""
         sales_analysis = {
             'total_orders': 0,
+            'total_revenue': 0.0,
             'product_sales': {},
             'popular_products': []
         }
 
-        orders = (self.orders_data.get('PMAI009OperationResponse', {})
-                 .get('ws_order_recout', {})
-                 .get('ws_order_res', []))
+        orders = data.orders
         
         sales_analysis['total_orders'] = len(orders)
 
-        for order in orders:
-            prod_id = order.get('ws_item_id')
-            if prod_id not in sales_analysis['product_sales']:
-                sales_analysis['product_sales'][prod_id] = {
-                    'quantity': 0,
-                    'revenue': 0,
-                    'product_name': order.get('ws_item_name')
-                }
-            
-            quantity = int(order.get('ws_quantity', 0))
-            price = float(order.get('ws_unit_price', 0))
-            sales_analysis['product_sales'][prod_id]['quantity'] += quantity
-            sales_analysis['product_sales'][prod_id]['revenue'] += quantity * price
+        # Number products in first-seen order, then aggregate per product in C
+        product_index = {}
+        codes = np.fromiter(
+            (product_index.setdefault(order.get('ws_item_id'), len(product_index)) for order in orders),
+            dtype=np.intp, count=len(orders))
+        quantities = np.fromiter((int(order.get('ws_quantity', 0)) for order in orders),
+                                 dtype=np.int32, count=len(orders))
+        prices = np.fromiter((float(order.get('ws_unit_price', 0)) for order in orders),
+                             dtype=np.float64, count=len(orders))
+
+        product_quantity = np.bincount(codes, weights=quantities, minlength=len(product_index))
+        product_revenue = np.bincount(codes, weights=quantities * prices, minlength=len(product_index))
+        first_order = np.unique(codes, return_index=True)[1]
 
-        # Sort products by quantity sold
-        popular_products = sorted(
+        for code, prod_id in enumerate(product_index):
+            sales_analysis['product_sales'][prod_id] = {
+                'quantity': int(product_quantity[code]),
+                'revenue': float(product_revenue[code]),
+                'product_name': orders[first_order[code]].get('ws_item_name')
+            }
+        sales_analysis['total_revenue'] = float(product_revenue.sum())
+
+        # Top products by quantity sold
+        sales_analysis['popular_products'] = heapq.nlargest(
+            3,
             sales_analysis['product_sales'].items(),
-            key=lambda x: x[1]['quantity'],
-            reverse=True
+            key=lambda x: x[1]['quantity']
         )
-        sales_analysis['popular_products'] = popular_products[:3]
 
         return sales_analysis
 
-    def _analyze_coupon_effectiveness(self) -> Dict[str, List[Dict]]:
+    @cached_analysis
+    def _analyze_coupon_effectiveness(self, data: DataSnapshot) -> Dict[str, List[Dict]]:
         """Analyze coupon effectiveness with correct JSON structure"""
-        current_date = datetime.now().date()
-        coupon_analysis = {
-            'active_coupons': [],
-            'expired_coupons': [],
-            'high_value_coupons': []
-        }
+        current_date = np.datetime64(datetime.now().date())
 
-        coupons = (self.coupons_data.get('PMAI016OperationResponse', {})
-                .get('ws_coupon_recout', {})
-                .get('ws_coupon_res', []))
+        # Parse dates once per distinct string, leaving out coupons whose
+        # dates are missing or malformed
+        coupons = []
+        start_dates = []
+        end_dates = []
+        for coupon in data.coupons:
+            try:
+                start_date = parse_date(coupon.get('ws_start_date', ''))
+                end_date = parse_date(coupon.get('ws_end_date', ''))
+            except (TypeError, ValueError):
+                logger.warning("Skipping coupon %s with an invalid date", coupon.get('ws_coupon_code'))
+                continue
+            coupons.append(coupon)
+            start_dates.append(start_date)
+            end_dates.append(end_date)
+        start_dates = np.array(start_dates, dtype='datetime64[D]')
+        end_dates = np.array(end_dates, dtype='datetime64[D]')
+        offer_percents = np.fromiter((float(coupon.get('ws_offer_percent', 0)) for coupon in coupons),
+                                     dtype=np.float64, count=len(coupons))
 
-        for coupon in coupons:
-            start_date = datetime.strptime(coupon.get('ws_start_date', ''), '%Y-%m-%d').date()
-            end_date = datetime.strptime(coupon.get('ws_end_date', ''), '%Y-%m-%d').date()
-            offer_percent = float(coupon.get('ws_offer_percent', 0))
-            
-            coupon_info = {
-                'code': coupon.get('ws_coupon_code'),
-                'discount': offer_percent,
-                'campaign': coupon.get('ws_campaigns_name'),
-                'start_date': start_date.strftime('%Y-%m-%d'),
-                'end_date': end_date.strftime('%Y-%m-%d')
-            }
+        active = current_date <= end_dates
+        high_value = offer_percents > 20  # High value threshold
+
+        start_strings = np.datetime_as_string(start_dates).tolist()
+        end_strings = np.datetime_as_string(end_dates).tolist()
+        active_flags = active.tolist()
+        coupon_infos = [{
+            'code': coupon.get('ws_coupon_code'),
+            'discount': offer_percent,
+            'campaign': coupon.get('ws_campaigns_name'),
+            'start_date': start_strings[i],
+            'end_date': end_strings[i],
+            'active': active_flags[i]
+        } for i, (coupon, offer_percent) in enumerate(zip(coupons, offer_percents.tolist()))]
 
-            if current_date <= end_date:
-                coupon_analysis['active_coupons'].append(coupon_info)
-            else:
-                coupon_analysis['expired_coupons'].append(coupon_info)
-                
-            if offer_percent > 20:  # High value threshold
-                coupon_analysis['high_value_coupons'].append(coupon_info)
+        coupon_analysis = {
+            'active_coupons': [coupon_infos[i] for i in np.flatnonzero(active).tolist()],
+            'expired_coupons': [coupon_infos[i] for i in np.flatnonzero(~active).tolist()],
+            'high_value_coupons': [coupon_infos[i] for i in np.flatnonzero(high_value).tolist()]
+        }
 
         return coupon_analysis  
     def generate_response(self, query: str, context: Dict[str, Any]) -> str:
         """Generate natural language response based on context"""
+        return self._context_response(parse_intent(query.lower()), context)
+
+    def _context_response(self, intent: QueryIntent, context: Dict[str, Any]) -> str:
+        """Build the context-based response for a parsed query intent"""
+
         # Investment recommendations
-        if 'investment' in query.lower():
+        if intent.investment:
             if 'best_product' in context:
                 product = context['best_product']
                 return (f"💡 Investment Recommendation:\n\n"
@@ -358,63 +642,63 @@ class AIAssistant:
                        f"Would you like to see detailed sales analytics for this product? 📈")
 
         # Inventory and reorder queries
-        if any(word in query.lower() for word in ['stock', 'inventory', 'reorder']):
+        if intent.stock:
             inventory = context.get('inventory_status', {})
             low_stock = inventory.get('low_stock', [])
             if low_stock:
-                response = "🚨 Low Stock Alert!\n\n"
+                parts = ["🚨 Low Stock Alert!\n\n"]
                 for product in low_stock:
-                    response += (f"📉 {product['name']}\n"
+                    parts.append(f"📉 {product['name']}\n"
                                f"   • Current stock: {product['stock']} units\n"
                                f"   • Threshold: {self.REORDER_THRESHOLD} units\n")
-                response += "\n⚡ Recommendation: Place reorder requests for these items soon.\n"
-                response += "Need help calculating optimal reorder quantities? 🤔"
-                return response
+                parts.append("\n⚡ Recommendation: Place reorder requests for these items soon.\n")
+                parts.append("Need help calculating optimal reorder quantities? 🤔")
+                return ''.join(parts)
 
         # Coupon-related queries
-        if 'coupon' in query.lower():
+        if intent.coupon:
             coupon_status = context.get('coupon_status', {})
-            if 'expired' in query.lower():
+            if intent.expired:
                 expired = coupon_status.get('expired_coupons', [])
                 if expired:
-                    response = "⏰ Expired Coupons:\n\n"
+                    parts = ["⏰ Expired Coupons:\n\n"]
                     for coupon in expired:
-                        response += f"🏷️ {coupon['code']}: {coupon['discount']}% off (Expired: {coupon['end_date']})\n"
-                    return response
+                        parts.append(f"🏷️ {coupon['code']}: {coupon['discount']}% off (Expired: {coupon['end_date']})\n")
+                    return ''.join(parts)
                 return "✨ No expired coupons found in the system."
-            elif 'active' in query.lower():
+            elif intent.active:
                 active = coupon_status.get('active_coupons', [])
                 if active:
-                    response = "✨ Active Coupon Codes:\n\n"
+                    parts = ["✨ Active Coupon Codes:\n\n"]
                     for coupon in active:
-                        response += f"🎟️ {coupon['code']}: {coupon['discount']}% off (Expires: {coupon['end_date']})\n"
-                    return response
+                        parts.append(f"🎟️ {coupon['code']}: {coupon['discount']}% off (Expires: {coupon['end_date']})\n")
+                    return ''.join(parts)
                 return "😔 No active coupons found in the system."
-            elif 'suggest' in query.lower() or 'recommend' in query.lower():
+            elif intent.promotion:
                 overstock = context.get('inventory_status', {}).get('overstock', [])
                 if overstock:
-                    response = "🎯 Recommended Promotions:\n\n"
+                    parts = ["🎯 Recommended Promotions:\n\n"]
                     for product in overstock[:3]:
                         suggested_discount = min(30, int(float(product['price']) * 0.15))
-                        response += f"📦 {product['name']}\n"
-                        response += f"   • Suggested discount: {suggested_discount}%\n"
-                        response += f"   • Current price: ${product['price']}\n"
-                    return response
+                        parts.append(f"📦 {product['name']}\n")
+                        parts.append(f"   • Suggested discount: {suggested_discount}%\n")
+                        parts.append(f"   • Current price: ${product['price']}\n")
+                    return ''.join(parts)
 
         # Sales analysis
-        if 'sales' in query.lower():
+        if intent.sales:
             sales = context.get('sales_analysis', {})
             if sales:
                 popular = sales.get('popular_products', [])
-                response = "📊 Sales Performance Summary:\n\n"
-                response += f"📈 Total orders: {sales.get('total_orders', 0)}\n\n"
+                parts = ["📊 Sales Performance Summary:\n\n"]
+                parts.append(f"📈 Total orders: {sales.get('total_orders', 0)}\n\n")
                 if popular:
-                    response += "🏆 Top Selling Products:\n"
+                    parts.append("🏆 Top Selling Products:\n")
                     for prod_id, details in popular:
-                        response += f"✨ {details['product_name']}\n"
-                        response += f"   • Units sold: {details['quantity']}\n"
-                        response += f"   • Revenue: ${details['revenue']:,.2f}\n"
-                return response
+                        parts.append(f"✨ {details['product_name']}\n")
+                        parts.append(f"   • Units sold: {details['quantity']}\n")
+                        parts.append(f"   • Revenue: ${details['revenue']:,.2f}\n")
+                return ''.join(parts)
 
         return ("👋 Hello! I'm your retail assistant. I can help you with:\n\n"
                 "📈 Product investment recommendations\n"
@@ -423,44 +707,46 @@ class AIAssistant:
                 "📊 Sales insights\n\n"
                 "What would you like to know? 😊")
 
-    def _analyze_product_potential(self) -> Dict[str, Any]:
+    @cached_analysis
+    def _analyze_product_potential(self, data: DataSnapshot) -> Dict[str, Any]:
         """Analyze product investment potential based on multiple factors"""
         product_analysis = {}
         
         # Get sales data
-        sales_data = self._analyze_sales_trends()
-        inventory_health = self._analyze_inventory_health()
+        sales_data = self._analyze_sales_trends(data)
+        inventory_health = self._analyze_inventory_health(data)
         
-        # Analyze each product
-        for product in self.products:
+        # Calculate key metrics for all products at once
+        products = data.products
+        sales = self._product_sales(data)
+        quantity = sales['quantity']
+        unit_price = self._product_column(data, 'unit_price')
+        cost_price = self._product_column(data, 'cost_price')
+        stock = self._product_column(data, 'stock')
+        total_revenue = sales_data['total_revenue']
+        metrics = {
+            'sales_velocity': np.where(quantity > 0, quantity / 30, 0),  # Units sold per day
+            'profit_margin': np.where(unit_price > 0,
+                                      (unit_price - cost_price) / np.maximum(unit_price, 1e-9) * 100, 0),
+            'stock_efficiency': np.minimum(stock / np.maximum(quantity, 1), 1),  # Stock turnover ratio
+            'revenue_contribution': sales['revenue'] / max(total_revenue, 1) * 100
+        }
+        
+        # Calculate weighted score
+        weights = {
+            'sales_velocity': 0.35,
+            'profit_margin': 0.25,
+            'stock_efficiency': 0.20,
+            'revenue_contribution': 0.20
+        }
+        
+        total_scores = sum(score * weights[metric] for metric, score in metrics.items())
+        metric_values = {metric: values.tolist() for metric, values in metrics.items()}
+        
+        for i, product in enumerate(products):
             product_id = product.get('ws_item_id')
-            
-            # Calculate key metrics
-            sales_info = sales_data['product_sales'].get(product_id, {
-                'quantity': 0,
-                'revenue': 0
-            })
-            
-            current_stock = int(product.get('ws_stock', 0))
-            unit_price = float(product.get('ws_unit_price', 0))
-            
-            # Calculate investment score based on multiple factors
-            investment_score = {
-                'sales_velocity': sales_info['quantity'] / 30 if sales_info['quantity'] > 0 else 0,  # Units sold per day
-                'profit_margin': (unit_price - float(product.get('ws_cost_price', 0))) / unit_price * 100,
-                'stock_efficiency': min(current_stock / max(sales_info['quantity'], 1), 1),  # Stock turnover ratio
-                'revenue_contribution': sales_info['revenue'] / max(sum(p['revenue'] for p in sales_data['product_sales'].values()), 1) * 100
-            }
-            
-            # Calculate weighted score
-            weights = {
-                'sales_velocity': 0.35,
-                'profit_margin': 0.25,
-                'stock_efficiency': 0.20,
-                'revenue_contribution': 0.20
-            }
-            
-            total_score = sum(score * weights[metric] for metric, score in investment_score.items())
+            investment_score = {metric: values[i] for metric, values in metric_values.items()}
+            total_score = float(total_scores[i])
             
             product_analysis[product_id] = {
                 'product_info': product,
@@ -481,110 +767,103 @@ class AIAssistant:
 
     def generate_investment_response(self, product_analysis: Dict[str, Any]) -> str:
         """Generate detailed investment recommendation response"""
-        # Sort products by total score
-        sorted_products = sorted(
+        # Get top 3 recommendations by total score
+        top_recommendations = heapq.nlargest(
+            3,
             product_analysis.items(),
-            key=lambda x: x[1]['total_score'],
-            reverse=True
+            key=lambda x: x[1]['total_score']
         )
         
-        # Get top 3 recommendations
-        top_recommendations = sorted_products[:3]
-        
-        response = "🎯 Investment Recommendations:\n\n"
+        parts = ["🎯 Investment Recommendations:\n\n"]
         
         for rank, (prod_id, analysis) in enumerate(top_recommendations, 1):
             product = analysis['product_info']
             metrics = analysis['metrics']
             
-            response += f"#{rank} - {product.get('ws_item_name')}\n"
-            response += f"📊 Investment Score: {analysis['total_score']:.1f}/100\n"
-            response += f"💰 Price: ${float(product.get('ws_unit_price', 0)):.2f}\n"
-            response += f"📈 Sales Velocity: {metrics['sales_velocity']:.1f} units/day\n"
-            response += f"✨ Profit Margin: {metrics['profit_margin']:.1f}%\n"
+            parts.append(f"#{rank} - {product.get('ws_item_name')}\n")
+            parts.append(f"📊 Investment Score: {analysis['total_score']:.1f}/100\n")
+            parts.append(f"💰 Price: ${float(product.get('ws_unit_price', 0)):.2f}\n")
+            parts.append(f"📈 Sales Velocity: {metrics['sales_velocity']:.1f} units/day\n")
+            parts.append(f"✨ Profit Margin: {metrics['profit_margin']:.1f}%\n")
             
             if analysis['recommendation_factors']:
-                response += "🌟 Key Strengths:\n"
+                parts.append("🌟 Key Strengths:\n")
                 for factor in analysis['recommendation_factors']:
-                    response += f"   • {factor}\n"
+                    parts.append(f"   • {factor}\n")
             
-            response += "\n"
+            parts.append("\n")
         
-        response += "Would you like detailed analytics for any of these products? 📊"
-        return response
+        parts.append("Would you like detailed analytics for any of these products? 📊")
+        return ''.join(parts)
 
-    def _check_reorder_levels(self) -> Dict[str, Any]:
+    @cached_analysis
+    def _check_reorder_levels(self, data: DataSnapshot) -> Dict[str, Any]:
         """Analyze products that need restocking based on minimum reorder levels"""
-        reorder_analysis = {
-            'urgent_reorder': [],
-            'approaching_reorder': [],
-            'reorder_suggestions': {}
-        }
+        current_stock = self._product_column(data, 'stock')
+        min_stock = self._product_column(data, 'min_stock')
+        quantity = self._product_sales(data)['quantity']
         
-        products = (self.inventory_data.get('PMAI006OperationResponse', {})
-                .get('ws_invent_recout', {})
-                .get('ws_invent_res', []))
+        # Calculate average daily sales and days of inventory remaining
+        avg_daily_sales = np.where(quantity > 0, quantity / 30, 0)
+        days_remaining = np.divide(current_stock, avg_daily_sales,
+                                   out=np.full(len(quantity), np.inf), where=avg_daily_sales != 0)
         
-        # Get sales data for calculating reorder quantities
-        sales_data = self._analyze_sales_trends()
+        # Calculate suggested reorder quantity
+        lead_time_days = 7  # Assumed lead time, adjust as needed
+        safety_stock = min_stock * 0.5  # 50% of min stock as safety stock
+        reorder_quantity = ((avg_daily_sales * lead_time_days) + safety_stock - current_stock).astype(np.int64)
         
-        for product in products:
-            current_stock = int(product.get('ws_stock', 0))
-            product_id = product.get('ws_item_id')
-            min_stock = int(product.get('ws_min_stock', self.REORDER_THRESHOLD))
-            
-            # Calculate average daily sales
-            product_sales = sales_data.get('product_sales', {}).get(product_id, {})
-            sales_quantity = product_sales.get('quantity', 0)
-            avg_daily_sales = sales_quantity / 30 if sales_quantity > 0 else 0
-            
-            # Calculate days of inventory remaining
-            days_remaining = float('inf') if avg_daily_sales == 0 else current_stock / avg_daily_sales
-            
-            product_info = {
-                'id': product_id,
-                'name': product.get('ws_item_name'),
-                'current_stock': current_stock,
-                'min_stock': min_stock,
-                'avg_daily_sales': avg_daily_sales,
-                'days_remaining': days_remaining,
-                'category': product.get('ws_category'),
-                'unit_price': float(product.get('ws_unit_price', 0))
+        urgent = current_stock <= min_stock
+        approaching = ~urgent & (current_stock <= (min_stock * 1.5))
+        
+        ids = self._product_column(data, 'id').tolist()
+        names = self._product_column(data, 'name').tolist()
+        categories = self._product_column(data, 'category').tolist()
+        prices = self._product_column(data, 'unit_price').tolist()
+        stocks = current_stock.tolist()
+        min_stocks = min_stock.tolist()
+        daily_sales = avg_daily_sales.tolist()
+        days_left = days_remaining.tolist()
+        quantities = reorder_quantity.tolist()
+        
+        def product_info(i: int, urgency: str, suggested_quantity: int) -> Dict[str, Any]:
+            return {
+                'id': ids[i],
+                'name': names[i],
+                'current_stock': stocks[i],
+                'min_stock': min_stocks[i],
+                'avg_daily_sales': daily_sales[i],
+                'days_remaining': days_left[i],
+                'category': categories[i],
+                'unit_price': prices[i],
+                'urgency': urgency,
+                'reorder_quantity': suggested_quantity
             }
-            
-            # Calculate suggested reorder quantity
-            lead_time_days = 7  # Assumed lead time, adjust as needed
-            safety_stock = min_stock * 0.5  # 50% of min stock as safety stock
-            reorder_quantity = int(
-                (avg_daily_sales * lead_time_days) + safety_stock - current_stock
-            )
-            
-            if current_stock <= min_stock:
-                product_info['urgency'] = 'URGENT'
-                product_info['reorder_quantity'] = max(reorder_quantity, min_stock)
-                reorder_analysis['urgent_reorder'].append(product_info)
-            elif current_stock <= (min_stock * 1.5):
-                product_info['urgency'] = 'SOON'
-                product_info['reorder_quantity'] = max(reorder_quantity, 0)
-                reorder_analysis['approaching_reorder'].append(product_info)
-                
-            if reorder_quantity > 0:
-                reorder_analysis['reorder_suggestions'][product_id] = {
-                    'quantity': reorder_quantity,
-                    'reason': f"Based on {avg_daily_sales:.1f} units/day average sales and {lead_time_days} days lead time"
-                }
+        
+        reorder_analysis = {
+            'urgent_reorder': [product_info(i, 'URGENT', max(quantities[i], min_stocks[i]))
+                               for i in np.flatnonzero(urgent).tolist()],
+            'approaching_reorder': [product_info(i, 'SOON', max(quantities[i], 0))
+                                    for i in np.flatnonzero(approaching).tolist()],
+            'reorder_suggestions': {
+                ids[i]: {
+                    'quantity': quantities[i],
+                    'reason': f"Based on {daily_sales[i]:.1f} units/day average sales and {lead_time_days} days lead time"
+                } for i in np.flatnonzero(reorder_quantity > 0).tolist()
+            }
+        }
         
         return reorder_analysis
 
     def generate_reorder_response(self, reorder_analysis: Dict[str, Any]) -> str:
         """Generate detailed response for reorder level analysis"""
-        response = "📦 Inventory Reorder Analysis:\n\n"
+        parts = ["📦 Inventory Reorder Analysis:\n\n"]
         
         # Handle urgent reorders
         if reorder_analysis['urgent_reorder']:
-            response += "🚨 URGENT REORDER REQUIRED:\n"
+            parts.append("🚨 URGENT REORDER REQUIRED:\n")
             for product in reorder_analysis['urgent_reorder']:
-                response += (
+                parts.append(
                     f"• {product['name']}\n"
                     f"  📊 Current Stock: {product['current_stock']} units\n"
                     f"  ⚠️ Minimum Level: {product['min_stock']} units\n"
@@ -595,9 +874,9 @@ class AIAssistant:
         
         # Handle approaching reorder level
         if reorder_analysis['approaching_reorder']:
-            response += "⚠️ APPROACHING REORDER LEVEL:\n"
+            parts.append("⚠️ APPROACHING REORDER LEVEL:\n")
             for product in reorder_analysis['approaching_reorder']:
-                response += (
+                parts.append(
                     f"• {product['name']}\n"
                     f"  📊 Current Stock: {product['current_stock']} units\n"
                     f"  ⚠️ Minimum Level: {product['min_stock']} units\n"
@@ -607,9 +886,9 @@ class AIAssistant:
                 )
         
         if not (reorder_analysis['urgent_reorder'] or reorder_analysis['approaching_reorder']):
-            response += "✅ All products are above minimum reorder levels.\n\n"
+            parts.append("✅ All products are above minimum reorder levels.\n\n")
         
-        response += (
+        parts.append(
             "📝 Note: Reorder quantities are calculated based on:\n"
             "• Average daily sales\n"
             "• Lead time (7 days)\n"
@@ -617,51 +896,95 @@ class AIAssistant:
             "Would you like detailed analytics for any specific product? 🔍"
         )
         
-        return response
+        return ''.join(parts)
     
     def process_query(self, query: str) -> str:
         """Enhanced query processing with better query type detection"""
         try:
             self.fetch_data()
-            
-            # Identify query type using keyword matching
-            reorder_keywords = ['reorder', 'stock', 'inventory', 'level', 'minimum', 'refill', 'replenish']
-            investment_keywords = ['invest', 'buy', 'purchase', 'recommend', 'best product']
-            
-            query_lower = query.lower()
-            
-            # Handle reorder level queries
-            if any(keyword in query_lower for keyword in reorder_keywords):
-                reorder_analysis = self._check_reorder_levels()
-                return self.generate_reorder_response(reorder_analysis)
-                
-            # Handle investment recommendation queries
-            elif any(keyword in query_lower for keyword in investment_keywords):
-                product_analysis = self._analyze_product_potential()
-                return self.generate_investment_response(product_analysis)
-                
-            # Default context-based response
-            context = {
-                'inventory_status': self._analyze_inventory_health(),
-                'sales_analysis': self._analyze_sales_trends(),
-                'coupon_status': self._analyze_coupon_effectiveness()
-            }
-            return self.generate_response(query, context)
+
+            # Queries with the same keyword intent against the same data
+            # snapshot get the same answer, so paraphrases share a response
+            intent = parse_intent(query.lower())
+            data = self._data
+            response = data.responses.get(intent)
+            if response is None:
+                response = self._answer_query(intent, data)
+                data.responses[intent] = response
+            return response
 
         except Exception as e:
-            logger.error(f"Error processing query: {str(e)}")
+            logger.error("Error processing query: %s", e)
             return ("😔 I apologize, but I encountered an error while processing your request. "
                 "Could you please rephrase your question? 🤔")
 
+    def _answer_query(self, intent: QueryIntent, data: DataSnapshot) -> str:
+        """Route a parsed query intent to the matching analysis on one data snapshot"""
+        # Handle reorder level queries
+        if intent.reorder:
+            reorder_analysis = self._check_reorder_levels(data)
+            return self.generate_reorder_response(reorder_analysis)
+            
+        # Handle investment recommendation queries
+        elif intent.purchase:
+            product_analysis = self._analyze_product_potential(data)
+            return self.generate_investment_response(product_analysis)
+            
+        # Default context-based response
+        context = {
+            'inventory_status': self._analyze_inventory_health(data),
+            'sales_analysis': self._analyze_sales_trends(data),
+            'coupon_status': self._analyze_coupon_effectiveness(data)
+        }
+        return self._context_response(intent, context)
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider that parses and serializes with orjson"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        # Hand orjson's bytes straight to the response without a str round-trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
 # Initialize Flask app
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+
+MAX_QUERY_LENGTH = 512
+
+# Reject oversized bodies with a 413 before they are read; 16 KB fits a
+# maximum-length query even with every character \u-escaped
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024
 
 # Initialize the AI Assistant
+# Embedding model options:
+#   EMBEDDING_BACKEND     sentence-transformers backend: 'torch' (default), 'onnx' or 'openvino'
+#   EMBEDDING_MODEL_FILE  exported file to load, e.g. 'onnx/model_qint8_avx512_vnni.onnx'
+#                         for dynamic INT8 on CPU
+#   EMBEDDING_DTYPE       torch weight precision, e.g. 'bfloat16' for AMX/AVX512-BF16 on recent Xeons
+#   EMBEDDING_COMPILE=1   wrap the torch transformer in torch.compile; point
+#                         TORCHINDUCTOR_CACHE_DIR at a persistent path to keep compiled kernels
 try:
-    model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-    assistant = AIAssistant(model)
+    assistant = AIAssistant(
+        'paraphrase-multilingual-MiniLM-L12-v2',
+        backend=os.environ.get('EMBEDDING_BACKEND', 'torch'),
+        model_file=os.environ.get('EMBEDDING_MODEL_FILE'),
+        dtype=os.environ.get('EMBEDDING_DTYPE'),
+        compile_model=os.environ.get('EMBEDDING_COMPILE') == '1'
+    )
+    if os.environ.get('PRELOAD_MODEL') == '1':
+        # Load the weights at import so a preloading Gunicorn master shares them with its workers
+        assistant.model
+    if os.environ.get('WARMUP') == '1':
+        assistant.warm_up()
 except Exception as e:
-    logger.error(f"Error initializing AI Assistant: {str(e)}")
+    logger.error("Error initializing AI Assistant: %s", e)
     raise
 
 @app.route('/health', methods=['GET'])
@@ -669,26 +992,29 @@ def health_check():
     """Simple health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now()
     })
 
 @app.route('/api/query', methods=['POST'])
 def process_query():
     """Handle incoming queries"""
+    # Get request data; oversized bodies raise a 413 handled below
+    data = request.get_json(silent=True)
+    query = data.get('query') if isinstance(data, dict) else None
+
     try:
-        # Get request data
-        data = request.get_json()
-        
         # Validate request
-        if not data or 'query' not in data:
+        if not isinstance(query, str) or not query.strip():
             return jsonify({
                 'error': 'Invalid request. Please provide a query field.',
                 'example': {
                     'query': 'Show me inventory status'
                 }
             }), 400
-            
-        query = data['query']
+        if len(query) > MAX_QUERY_LENGTH:
+            return jsonify({
+                'error': f'Query is too long. Please keep it to {MAX_QUERY_LENGTH} characters or fewer.'
+            }), 400
         
         # Process query
         response = assistant.process_query(query)
@@ -698,15 +1024,22 @@ def process_query():
             'status': 'success',
             'query': query,
             'response': response,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now()
         })
         
     except Exception as e:
-        logger.error(f"Error processing request: {str(e)}")
+        logger.error("Error processing request: %s", e)
         return jsonify({
             'error': 'Internal server error',
             'message': str(e)
         }), 500
 
+@app.errorhandler(413)
+def request_too_large(e):
+    """Reject bodies over MAX_CONTENT_LENGTH with a JSON error"""
+    return jsonify({
+        'error': 'Request body is too large.'
+    }), 413
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=False)
@@ -0,0 +1,49 @@
+# Gunicorn settings for serving app:app, e.g. `gunicorn app:app`
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# Cores this server may use; respects `numactl`/`taskset` on the launch command
+if hasattr(os, 'sched_getaffinity'):
+    _cores = sorted(os.sched_getaffinity(0))
+else:
+    _cores = list(range(os.cpu_count() or 1))
+
+# Threaded workers overlap API round-trips and GIL-releasing numpy/torch work
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', max(1, len(_cores) // 2)))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = 60
+
+# Import the app once in the master so workers share its pages copy-on-write.
+# With PRELOAD_MODEL=1 that includes the embedding weights (CPU only: CUDA
+# can't be initialised before fork).
+preload_app = True
+
+# Split the cores between workers so torch/BLAS pools don't oversubscribe them.
+# This uses the worker count above: set WEB_CONCURRENCY rather than passing -w,
+# which overrides `workers` only after this file has run.
+_cores_per_worker = max(1, len(_cores) // workers)
+os.environ.setdefault('OMP_NUM_THREADS', str(_cores_per_worker))
+os.environ.setdefault('MKL_NUM_THREADS', str(_cores_per_worker))
+
+# With PIN_WORKERS=1 each worker is pinned to its own slice of cores, so its
+# torch/BLAS threads keep their caches warm instead of migrating. On multi-socket
+# hosts also launch under `numactl --cpunodebind=0 --membind=0` to keep the
+# weights and threads on one NUMA node.
+pin_workers = os.environ.get('PIN_WORKERS') == '1' and hasattr(os, 'sched_setaffinity')
+
+
+def pre_fork(server, worker):
+    # Give the new worker the lowest core slice not held by a live worker
+    taken = {getattr(w, 'core_slot', None) for w in server.WORKERS.values()}
+    worker.core_slot = next(slot for slot in range(len(taken) + 1) if slot not in taken)
+
+
+def post_fork(server, worker):
+    if not pin_workers:
+        return
+    start = worker.core_slot * _cores_per_worker
+    cores = _cores[start:start + _cores_per_worker]
+    if cores:
+        os.sched_setaffinity(0, cores)